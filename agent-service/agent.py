@@ -1,33 +1,74 @@
-from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode, tools_condition
+import asyncio
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, message_chunk_to_message
 from model import IncidentState
-from nodes import run_investigator, decide_action
+from nodes import BOUND_LLM, SYS_MSG, HUMAN_TMPL, trim_history, decide_action
 from tools import k8s_investigator_tools
 
-def build_agent():
+TOOL_MAP = {t.name: t for t in k8s_investigator_tools}
+
+# Same bound as LangGraph's default recursion limit (25 steps ~ 12 LLM turns)
+MAX_TURNS = 12
+
+async def _call_tool(call) -> ToolMessage:
+    tool = TOOL_MAP.get(call["name"])
+    if tool is None:
+        content = f"Error: {call['name']} is not a valid tool, try one of {list(TOOL_MAP)}."
+    else:
+        try:
+            content = await tool.ainvoke(call["args"])
+        except Exception as e:
+            content = f"Error: {e!r}"
+    return ToolMessage(content=content, name=call["name"], tool_call_id=call["id"])
+
+async def stream_agent(state: IncidentState):
+    """
+    Runs the Investigator loop and yields (kind, payload) progress events.
+    Flow: Investigator -> (Loop: Tools -> Investigator) -> Decide
+    If MAX_TURNS runs out before a final answer, the decision is require_human_approval.
+    The last event is always ("decision", {"decision": ..., "root_cause": ...}).
+    """
+    messages = [SYS_MSG, HumanMessage(content=HUMAN_TMPL(
+        event_type=state.event_type,
+        severity=state.severity,
+        resource=state.resource,
+        message=state.message
+    ))]
+
+    for _ in range(MAX_TURNS):
+        # Stream the reply and merge the chunks (including partial tool calls)
+        response = None
+        async for chunk in BOUND_LLM.astream(trim_history(messages)):
+            if chunk.content:
+                yield "token", chunk.content
+            response = chunk if response is None else response + chunk
+        # An empty stream is treated as an empty final reply
+        response = message_chunk_to_message(response) if response is not None else AIMessage(content="")
+        messages.append(response)
+
+        # A reply without tool calls is the final analysis
+        if not response.tool_calls:
+            state.root_cause = response.content or None
+            break
+
+        for call in response.tool_calls:
+            yield "tool_call", call
+        # Tool calls from one turn are independent, so run them concurrently
+        for result in await asyncio.gather(*(_call_tool(call) for call in response.tool_calls)):
+            messages.append(result)
+            yield "tool_result", result
+    else:
+        # Out of turns without a final answer: there is no root cause to act on
+        state.messages = messages
+        yield "decision", {"decision": "require_human_approval", "root_cause": "Unknown"}
+        return
+
+    state.messages = messages
+    yield "decision", await decide_action(state)
+
+async def run_agent(state: IncidentState) -> dict:
     """
-    Constructs the Investigator Agent Graph.
-    Flow: User -> Investigator -> (Loop: Tools -> Investigator) -> Decide -> End
+    Runs the full investigation and returns {"decision": ..., "root_cause": ...}.
     """
-    graph = StateGraph(IncidentState)
-    
-    graph.add_node("investigator", run_investigator)
-    graph.add_node("tools", ToolNode(k8s_investigator_tools))
-    graph.add_node("decide", decide_action)
-
-    graph.set_entry_point("investigator")
-    
-    # The 'investigator' node will either yield tool calls or a final text response
-    graph.add_conditional_edges(
-        "investigator",
-        tools_condition,
-        {
-            "tools": "tools",  # If tool calls detected, go to tools node
-            "__end__": "decide"  # If no tools, move to decision making
-        }
-    )
-    
-    graph.add_edge("tools", "investigator")
-    graph.add_edge("decide", END)
-    
-    return graph.compile()
+    async for kind, payload in stream_agent(state):
+        if kind == "decision":
+            return payload
@@ -0,0 +1,75 @@
+import os
+import asyncio
+import logging
+from nodes import analyze_incident_batch
+
+# Handlers are attached once by main.setup_logger()
+logger = logging.getLogger("ai-events")
+
+class IncidentBatcher:
+    """
+    Coalesces incidents that arrive within a short window so a burst is triaged
+    with one LLM call. Lone incidents, timeouts, and unparseable batch replies
+    fall back to the full single-incident agent.
+    """
+
+    def __init__(self, run_single):
+        self.run_single = run_single
+        self.max_batch = int(os.getenv("INCIDENT_BATCH_SIZE", "8"))
+        self.window = int(os.getenv("INCIDENT_BATCH_WINDOW_MS", "50")) / 1000
+        self.timeout = int(os.getenv("INCIDENT_BATCH_TIMEOUT", "30"))
+        self.queue = asyncio.Queue()
+        self._tasks = set()
+
+    async def submit(self, inputs):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((inputs, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        results = None
+        if len(batch) > 1:
+            try:
+                results = await asyncio.wait_for(
+                    analyze_incident_batch([inputs for inputs, _ in batch]), self.timeout
+                )
+            except Exception as e:
+                logger.warning(f"Batched triage failed: {e}")
+            if results is None:
+                logger.info(f"Falling back to single-shot for {len(batch)} incidents")
+            else:
+                logger.info(f"Triaged {len(batch)} incidents in one batch")
+
+        if results is None:
+            await asyncio.gather(*(self._run_one(inputs, future) for inputs, future in batch))
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _run_one(self, inputs, future):
+        try:
+            result = await self.run_single(inputs)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
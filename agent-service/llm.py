@@ -1,13 +1,48 @@
 import os
+from functools import lru_cache
+import httpx
 from langchain_core.language_models import BaseLanguageModel
 from langchain_ollama import ChatOllama
 
+# Parsed once at import; the single source of truth for the LLM configuration
+_MODEL = os.getenv("OLLAMA_MODEL", "qwen2.5:0.5b")
+_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+_TEMP = float(os.getenv("OLLAMA_TEMPERATURE", "0.1"))
+_CTX = int(os.getenv("OLLAMA_NUM_CTX", "2048"))
+_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "60"))
+_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+@lru_cache(maxsize=1)
 def get_llm() -> BaseLanguageModel:
+    """
+    Returns a shared ChatOllama instance so the underlying HTTP client
+    (and its keep-alive connections to Ollama) is reused across requests.
+    """
     llm = ChatOllama(
-        model=os.getenv("OLLAMA_MODEL", "qwen2.5:0.5b"),
-        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
-        temperature=float(os.getenv("OLLAMA_TEMPERATURE", "0.1")),
-        num_ctx=int(os.getenv("OLLAMA_NUM_CTX", "2048")),
-        timeout=int(os.getenv("OLLAMA_TIMEOUT", "60"))
+        model=_MODEL,
+        base_url=_BASE_URL,
+        temperature=_TEMP,
+        num_ctx=_CTX,
+        timeout=_TIMEOUT,
+        keep_alive=_KEEP_ALIVE,
+        async_client_kwargs={
+            "limits": httpx.Limits(max_keepalive_connections=40, keepalive_expiry=30)
+        }
     )
     return llm
+
+async def ensure_model_loaded():
+    """
+    Loads the model into Ollama ahead of the first incident.
+    A generate request without a prompt only loads the model and pins it for keep_alive.
+    """
+    async with httpx.AsyncClient(base_url=_BASE_URL) as http:
+        resp = await http.post(
+            "/api/generate",
+            json={
+                "model": _MODEL,
+                "keep_alive": _KEEP_ALIVE
+            },
+            timeout=_TIMEOUT
+        )
+        resp.raise_for_status()
@@ -1,33 +1,153 @@
+import os
+import asyncio
+import hashlib
+import orjson
+from cachetools import TTLCache
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
-from model import IncidentSignal
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from model import IncidentSignal, IncidentState
 from logger import setup_logger
-from agent import build_agent
+from agent import stream_agent, run_agent
+from tools import check_k8s_client, close_k8s_client, invalidate_k8s_cache
+from llm import ensure_model_loaded
+from batcher import IncidentBatcher
 
-app = FastAPI()
 logger = setup_logger()
 
+# Opt-in: coalesce bursts of incidents into one triage LLM call (see batcher.py)
+INCIDENT_BATCHING = os.getenv("INCIDENT_BATCHING", "false").lower() == "true"
+batcher = None
+
+# Incident floods repeat the same signal; reuse the verdict for a short window
+# instead of re-running the whole investigation. Duplicates that arrive while the
+# first one is still being investigated wait on its in-flight task.
+_decision_cache = TTLCache(maxsize=1024, ttl=60)
+_in_flight = {}
+
+def incident_key(event: IncidentSignal) -> str:
+    # The message is left out: detectors embed the measured value, so it differs on every repeat
+    return hashlib.blake2b(
+        f"{event.type}|{event.namespace or 'default'}|{event.resource}|{event.severity}".encode(),
+        digest_size=16
+    ).hexdigest()
+
+def _finish_investigation(key, task):
+    _in_flight.pop(key, None)
+    if not task.cancelled() and task.exception() is None:
+        result = task.result()
+        _decision_cache[key] = {"decision": result.get("decision"), "root_cause": result.get("root_cause")}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global batcher
+    # Warm the model so the first /events call doesn't pay the load cost
+    try:
+        await ensure_model_loaded()
+        logger.info("LLM model loaded")
+    except Exception as e:
+        logger.warning(f"LLM warm-up failed: {e}")
+    # Open the Kubernetes connection pool before the first tool call
+    try:
+        await check_k8s_client()
+    except Exception as e:
+        logger.warning(f"Kubernetes client warm-up failed: {e}")
+
+    batch_task = None
+    if INCIDENT_BATCHING:
+        batcher = IncidentBatcher(run_single=lambda inputs: run_agent(IncidentState(**inputs)))
+        batch_task = asyncio.create_task(batcher.run())
+    yield
+    if batch_task:
+        batch_task.cancel()
+    await close_k8s_client()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
 @app.get("/")
 def root():
-    return JSONResponse(status_code=200, content={"message": "Welcome to the Agent Service"})
+    return {"message": "Welcome to the Agent Service"}
+
+async def drive_investigation(inputs, queue):
+    """
+    Runs the agent as a task independent of any client, pushing progress events
+    to queue (None marks the end) and returning the final decision.
+    """
+    result = {}
+    try:
+        async for kind, payload in stream_agent(IncidentState(**inputs)):
+            queue.put_nowait((kind, payload))
+            if kind == "decision":
+                result = payload
+    finally:
+        queue.put_nowait(None)
+    return result
+
+async def stream_investigation(queue, task):
+    """
+    Relays the investigation's progress as NDJSON lines: LLM tokens, tool calls,
+    tool results, and finally the decision.
+    """
+    while (item := await queue.get()) is not None:
+        kind, payload = item
+        if kind == "token":
+            yield orjson.dumps({"type": "token", "content": payload}) + b"\n"
+        elif kind == "tool_call":
+            yield orjson.dumps({"type": "tool_call", "tool": payload["name"], "args": payload["args"]}) + b"\n"
+        elif kind == "tool_result":
+            yield orjson.dumps({"type": "tool_result", "tool": payload.name, "content": payload.content}) + b"\n"
+
+    result = await asyncio.shield(task)
+    logger.info(f"Agent Decision: {result.get('decision')}")
+    logger.info(f"Root Cause: {result.get('root_cause')}")
+    yield orjson.dumps({"type": "decision", "message": "Event received", "decision": result.get("decision")}) + b"\n"
 
 @app.post("/events")
-def receive_event(event: IncidentSignal):
+async def receive_event(event: IncidentSignal, stream: bool = False):
     logger.info(
         f"Event received | type={event.type} "
         f"severity={event.severity} "
         f"resource={event.resource} "
         f"source={event.source}"
     )
-    agent = build_agent()
-    result = agent.invoke({
+    key = incident_key(event)
+    cached = _decision_cache.get(key)
+    if cached is None and key in _in_flight:
+        logger.info("Duplicate incident, waiting on in-flight investigation")
+        # Shielded so a disconnecting duplicate doesn't cancel the shared investigation
+        cached = await asyncio.shield(_in_flight[key])
+    if cached is not None:
+        logger.info(f"Duplicate incident, reusing decision: {cached['decision']}")
+        content = {"message": "Event received", "decision": cached["decision"]}
+        if stream:
+            line = orjson.dumps({"type": "decision", **content}) + b"\n"
+            return StreamingResponse(iter([line]), media_type="application/x-ndjson")
+        return content
+
+    # A fresh incident means cached cluster state for this resource is stale
+    invalidate_k8s_cache(event.resource.split("/")[-1], event.namespace or "default")
+    inputs = {
         "event_type": event.type,
         "severity": event.severity,
         "resource": event.resource,
         "message": event.message
-    })
-    
+    }
+    # Streamed or not, the run is a task registered in _in_flight so duplicates can
+    # await it, and it finishes even if the client disconnects.
+    if stream:
+        queue = asyncio.Queue()
+        task = asyncio.create_task(drive_investigation(inputs, queue))
+    else:
+        investigation = batcher.submit(inputs) if batcher else run_agent(IncidentState(**inputs))
+        task = asyncio.create_task(investigation)
+    _in_flight[key] = task
+    task.add_done_callback(lambda t: _finish_investigation(key, t))
+    if stream:
+        return StreamingResponse(stream_investigation(queue, task), media_type="application/x-ndjson")
+
+    result = await asyncio.shield(task)
+
     logger.info(f"Agent Decision: {result.get('decision')}")
     logger.info(f"Root Cause: {result.get('root_cause')}")
 
-    return JSONResponse(status_code=200, content={"message": "Event received", "decision": result.get("decision")})
\ No newline at end of file
+    return {"message": "Event received", "decision": result.get("decision")}
\ No newline at end of file
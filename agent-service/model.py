@@ -1,21 +1,22 @@
-from pydantic import BaseModel,Field
-from typing import Optional,Dict,Any,Annotated
-from langgraph.graph.message import add_messages
+from pydantic import BaseModel,ConfigDict,Field
+from typing import Optional,Dict,Any
 from datetime import datetime
 
 class IncidentSignal(BaseModel):
     id: str = Field(...,description="Unique Event Id")
-    type: str = Field(...,description="Event Type",example="cpu_spike")
-    severity: str = Field(...,description="Event Severity",example="medium")
-    namespace: Optional[str]
+    type: str = Field(...,description="Event Type",examples=["cpu_spike"])
+    severity: str = Field(...,description="Event Severity",examples=["medium"])
+    namespace: Optional[str] = None
     resource: str
     message: str
     timestamp: datetime
-    metadata: Optional[Dict[str,str]] = {}
+    metadata: Optional[Dict[str,str]] = Field(default_factory=dict)
     source: str = Field(...,description="Event Source")
 
 
 class IncidentState(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     event_type: str
     severity: str
     resource: str
@@ -23,5 +24,5 @@ class IncidentState(BaseModel):
 
     root_cause: Optional[str] = None
     decision: Optional[str] = None
-    messages: Annotated[list[Any], add_messages] = []
+    messages: list[Any] = Field(default_factory=list)
     
\ No newline at end of file
@@ -1,20 +1,16 @@
+import os
+import json
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, ToolMessage
 from llm import get_llm
 from tools import k8s_investigator_tools
 
-# --- Investigator Node ---
-def run_investigator(state):
-    """
-    The brain of the agent. It receives the state, checks if there are message history,
-    and calls the LLM with tools bound.
-    """
-    llm = get_llm().bind_tools(k8s_investigator_tools)
-    
-    # If this is the first turn, initialize the conversation with context
-    if not state.messages:
-        sys_msg = SystemMessage(content="""You are a Senior SRE Agent intentionally designed to investigate Kubernetes incidents.
+# The tool set is static, so bind the schemas once instead of on every turn.
+BOUND_LLM = get_llm().bind_tools(k8s_investigator_tools)
+
+# The prompts are constant, so build them once at import.
+SYS_MSG = SystemMessage(content="""You are a Senior SRE Agent intentionally designed to investigate Kubernetes incidents.
 
 YOUR PROTOCOL:
 1. REVIEW the incident details.
@@ -28,28 +24,63 @@ YOUR PROTOCOL:
 
 DO NOT stop after calling a tool. You MUST provide the final analysis based on the tool's result.
 """)
-        human_msg = HumanMessage(content=f"""
+
+HUMAN_TMPL = """
 NEW INCIDENT DETECTED:
-- Type: {state.event_type}
-- Severity: {state.severity}
-- Resource: {state.resource}
-- Message: {state.message}
+- Type: {event_type}
+- Severity: {severity}
+- Resource: {resource}
+- Message: {message}
 
 Please investigate.
-""")
-        # We start with these messages
-        # Note: In LangGraph, we return the NEW messages to append.
-        # But for the first call, we need to pass them to invoke() as well.
-        messages = [sys_msg, human_msg]
-        response = llm.invoke(messages)
-        # Return the initial prompt AND the LLM's first response (which might be a tool call)
-        return {"messages": [sys_msg, human_msg, response]}
-    else:
-        # Subsequent turns: just pass the history
-        response = llm.invoke(state.messages)
-        return {"messages": [response]}
-
-# --- Decision Node ---
+""".format
+
+# Only the most recent tool results are sent back to the LLM verbatim; older ones
+# (often multi-KB log dumps) are replaced by a stub so prefill stays bounded.
+KEEP_TOOL_RESULTS = int(os.getenv("KEEP_TOOL_RESULTS", "4"))
+
+def trim_history(messages):
+    """
+    Returns a copy of the conversation where all but the last KEEP_TOOL_RESULTS
+    tool outputs are truncated. Tool call/result pairing is preserved.
+    """
+    tool_positions = [i for i, m in enumerate(messages) if isinstance(m, ToolMessage)]
+    stale = set(tool_positions[:-KEEP_TOOL_RESULTS] if KEEP_TOOL_RESULTS else tool_positions)
+    if not stale:
+        return messages
+    trimmed = []
+    for i, msg in enumerate(messages):
+        if i in stale:
+            size = len(str(msg.content).encode())
+            msg = msg.model_copy(update={"content": f"[truncated, {size} bytes]"})
+        trimmed.append(msg)
+    return trimmed
+
+# --- Decision Step ---
+# The decision is a two-way choice, so a keyword rule replaces the second LLM call.
+# Set USE_LLM_DECIDER=true to fall back to the LLM classifier for comparison.
+USE_LLM_DECIDER = os.getenv("USE_LLM_DECIDER", "false").lower() == "true"
+
+SAFE_SEVERITIES = {"low", "medium"}
+# Root causes a pod restart or resource bump can safely address
+SAFE_CAUSES = (
+    "oomkilled",
+    "memory limit",
+    "crashloopbackoff",
+    "liveness probe",
+    "readiness probe",
+    "evicted",
+)
+
+def classify_action(severity: str, root_cause: str) -> str:
+    """
+    Returns 'auto_mitigate' only for low/medium incidents with a well-understood root cause.
+    """
+    cause = root_cause.lower()
+    if severity.lower() in SAFE_SEVERITIES and any(k in cause for k in SAFE_CAUSES):
+        return "auto_mitigate"
+    return "require_human_approval"
+
 decision_prompt = ChatPromptTemplate.from_template("""
 You are an SRE decision system.
 Based on the investigation, choose the best action.
@@ -65,23 +96,77 @@ Options:
 
 Answer with ONLY the option name.
 """)
+DECISION_CHAIN = decision_prompt | get_llm() | StrOutputParser()
 
-def decide_action(state):
+async def decide_action(state):
     """
     Decides the next step after investigation is complete.
     """
-    # The last message from the investigator loop should contain the explanation
-    # We search backwards for the last AIMessage that has content (not just tool calls)
-    root_cause_text = "Unknown"
-    for msg in reversed(state.messages):
-        if hasattr(msg, "content") and msg.content:
-            root_cause_text = msg.content
-            break
+    # The investigator records its final answer as root_cause. If it ended on an
+    # empty reply, search backwards for the last AIMessage that has content
+    # (never a tool output or the incident prompt itself).
+    root_cause_text = state.root_cause
+    if not root_cause_text:
+        root_cause_text = "Unknown"
+        for i in range(len(state.messages) - 1, -1, -1):
+            msg = state.messages[i]
+            if isinstance(msg, AIMessage) and msg.content:
+                root_cause_text = msg.content
+                break
             
-    chain = decision_prompt | get_llm() | StrOutputParser()
-    action = chain.invoke({
+    if not USE_LLM_DECIDER:
+        return {"decision": classify_action(state.severity, root_cause_text), "root_cause": root_cause_text}
+
+    action = await DECISION_CHAIN.ainvoke({
         "event_type": state.event_type,
         "severity": state.severity,
         "root_cause": root_cause_text
     })
-    return {"decision": action.strip().lower(), "root_cause": root_cause_text}
\ No newline at end of file
+    return {"decision": action.strip().lower(), "root_cause": root_cause_text}
+
+# --- Batched Triage ---
+BATCH_SYS_MSG = SystemMessage(content="""You are a Senior SRE Agent triaging several Kubernetes incidents at once.
+
+For EACH incident, determine the most likely root cause from its details.
+Reply with ONLY a JSON list, one object per incident, in the same order:
+[{"incident": 1, "root_cause": "..."}, {"incident": 2, "root_cause": "..."}]
+""")
+
+BATCH_INCIDENT_TMPL = """{n}.
+- Type: {event_type}
+- Severity: {severity}
+- Resource: {resource}
+- Message: {message}""".format
+
+async def analyze_incident_batch(incidents):
+    """
+    Analyzes a burst of incidents with a single LLM call so they share one prompt prefill.
+    Returns one {"decision", "root_cause"} dict per incident, or None if the reply
+    cannot be matched back to the incidents.
+    No tools run on this path, so the root cause is an unverified hypothesis and
+    every batched result requires human approval.
+    """
+    listing = "\n".join(
+        BATCH_INCIDENT_TMPL(n=n, **inc) for n, inc in enumerate(incidents, start=1)
+    )
+    human_msg = HumanMessage(content=f"You have {len(incidents)} incidents:\n{listing}")
+    response = await get_llm().ainvoke([BATCH_SYS_MSG, human_msg])
+
+    text = response.content.strip()
+    # Small models often wrap JSON in a markdown fence
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        analyses = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(analyses, list) or len(analyses) != len(incidents):
+        return None
+
+    results = []
+    for analysis in analyses:
+        root_cause = analysis.get("root_cause") if isinstance(analysis, dict) else None
+        if not root_cause:
+            return None
+        results.append({"decision": "require_human_approval", "root_cause": root_cause})
+    return results
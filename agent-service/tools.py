@@ -1,39 +1,112 @@
 import os
+import asyncio
+from functools import wraps
+from cachetools import TTLCache
 from langchain_core.tools import tool
-from kubernetes import client, config
-from kubernetes.client.rest import ApiException
+from kubernetes_asyncio import client, config
+from kubernetes_asyncio.client.rest import ApiException
 
 
 _k8s_client_initialized = False
+_k8s_client_lock = asyncio.Lock()
+_CORE_V1 = None
 
-def check_k8s_client():
+async def check_k8s_client():
     """
     Safely initializes the K8s client. 
     Works for both local (minikube/docker-desktop) and in-cluster (Pod) execution.
+    The CoreV1Api is created once and shared so its connection pool is reused.
+    Only core/v1 is used, so no dynamic discovery client is built; one call to
+    get_api_resources() opens the first connection before any tool needs it.
     """
-    global _k8s_client_initialized
+    global _k8s_client_initialized, _CORE_V1
     if _k8s_client_initialized:
         return
-    try:
-        config.load_kube_config()
-        print("Loaded cluster configs...")
-    except Exception as e:
-        print("Failed to load cluster configs: " + str(e))
-        raise e
-    _k8s_client_initialized = True
+    async with _k8s_client_lock:
+        if _k8s_client_initialized:
+            return
+        k8s_config = client.Configuration()
+        try:
+            await config.load_kube_config(client_configuration=k8s_config)
+            print("Loaded cluster configs...")
+        except Exception as e:
+            print("Failed to load cluster configs: " + str(e))
+            raise e
+        # kubernetes_asyncio already pools 100 connections; only override when asked
+        if os.getenv("K8S_POOL_MAXSIZE"):
+            k8s_config.connection_pool_maxsize = int(os.getenv("K8S_POOL_MAXSIZE"))
+        api_client = client.ApiClient(configuration=k8s_config)
+        v1 = client.CoreV1Api(api_client)
+        try:
+            await v1.get_api_resources()
+        except Exception:
+            # Don't leak the aiohttp session; the next call retries from scratch
+            await api_client.close()
+            raise
+        _CORE_V1 = v1
+        _k8s_client_initialized = True
 
+async def close_k8s_client():
+    """
+    Closes the shared client's HTTP session. Called when the app shuts down.
+    """
+    global _k8s_client_initialized, _CORE_V1
+    async with _k8s_client_lock:
+        if _CORE_V1 is not None:
+            await _CORE_V1.api_client.close()
+        _CORE_V1 = None
+        _k8s_client_initialized = False
 
-@tool
-def k8s_get_pod_health(pod_name: str,namespace: str = "default") -> str:
+
+# Cluster state rarely changes within a few seconds, so repeat lookups made while
+# the LLM reasons over one incident are served from memory. Everything runs on the
+# event loop, so the cache needs no lock.
+_tool_cache = TTLCache(maxsize=256, ttl=5)
+
+def ttl_cached(func):
     """
-    Advanced Health Check.
-    Retrieves the status, restart count, and recent events for a specific Pod.
-    Useful for diagnosing 'Pending', 'CrashLoopBackOff', or 'Error' states.
+    Caches an async tool body's result keyed on (function name, *args).
+    """
+    @wraps(func)
+    async def wrapper(*args):
+        key = (func.__name__, *args)
+        cached = _tool_cache.get(key)
+        if cached is not None:
+            return cached
+        result = await func(*args)
+        _tool_cache[key] = result
+        return result
+    return wrapper
+
+def invalidate_k8s_cache(pod_name: str, namespace: str = "default"):
+    """
+    Drops cached tool results for a pod (and its namespace listing) so a new
+    incident on that resource is investigated against fresh cluster state.
     """
-    check_k8s_client()
-    v1= client.CoreV1Api()
+    for key in list(_tool_cache.keys()):
+        if key[1] == pod_name or key == ("_list_pods", namespace):
+            _tool_cache.pop(key, None)
+
+
+@ttl_cached
+async def _get_pod_health(pod_name: str, namespace: str) -> str:
+    await check_k8s_client()
+    v1 = _CORE_V1
+    # The pod and its events are independent lookups, so issue them concurrently
+    pod, event_resp = await asyncio.gather(
+        v1.read_namespaced_pod(name=pod_name,namespace=namespace),
+        v1.list_namespaced_event(namespace=namespace, field_selector=f"involvedObject.name={pod_name}"),
+        return_exceptions=True
+    )
+    if isinstance(pod, ApiException):
+        if pod.status == 404:
+            return f"Pod {pod_name} not found in namespace {namespace}"
+        return f"API Error: {pod.reason}"
+    if isinstance(pod, BaseException):
+        raise pod
     try:
-        pod = v1.read_namespaced_pod(name=pod_name,namespace=namespace)
+        if isinstance(event_resp, BaseException):
+            raise event_resp
         status = pod.status
         container_statuses = []
         if status.container_statuses:
@@ -47,7 +120,6 @@ def k8s_get_pod_health(pod_name: str,namespace: str = "default") -> str:
                     state = f"Terminated (Reason: {c.state.terminated.reason}), ExitCode: {c.state.terminated.exit_code}, Message: {c.state.terminated.message}"
                 container_statuses.append(f"- Container '{c.name}': {state} (Restarts: {c.restart_count})")
             
-        event_resp = v1.list_namespaced_event(namespace=namespace, field_selector=f"involvedObject.name={pod_name}")
         events = [f"[{e.type}] {e.reason}: {e.message}" for e in event_resp.items]
         
         c_stats_text = "\n".join(container_statuses)
@@ -66,44 +138,81 @@ Recent Events:
 """
         return report
     except ApiException as e:
-        if e.status == 404:
-            return f"Pod {pod_name} not found in namespace {namespace}"
-        else:
-            return f"API Error: {e.reason}"
+        return f"API Error: {e.reason}"
 
-@tool
-def k8s_fetch_logs(pod_name:str,namespace:str="default", lines:int=50) -> str:
+# Markers the investigator prompt reasons about; counted so the LLM sees the signal up front
+LOG_MARKERS = (b"OOMKilled", b"Connection refused", b"panic:", b"Error")
+
+def summarize_logs(buf: bytes) -> dict:
     """
-    Fetches the last N lines of logs from a Pod.
-    Automatically detects if there are multiple containers and fetches logs for the first one.
+    Counts key failure markers in a raw log buffer and finds the last line
+    containing one of them. bytes.count/rfind scan in C, so no per-line Python loop.
     """
-    
+    counts = {marker.decode(): buf.count(marker) for marker in LOG_MARKERS}
+    last_pos = max(buf.rfind(marker) for marker in LOG_MARKERS)
+    last_error = None
+    if last_pos >= 0:
+        start = buf.rfind(b"\n", 0, last_pos) + 1
+        end = buf.find(b"\n", last_pos)
+        last_error = buf[start:end if end >= 0 else len(buf)].decode("utf-8", errors="replace").strip()
+    return {"counts": counts, "last_error": last_error}
+
+# Logs up to LOG_WINDOW_BYTES are returned whole (the default 50-line tail fits
+# comfortably); larger dumps are cut to a head/tail excerpt to bound prefill.
+LOG_WINDOW_BYTES = 16 * 1024
+LOG_HEAD_LINES = 20
+LOG_TAIL_LINES = 100
 
-    check_k8s_client()
-    v1 = client.CoreV1Api()
+def log_window(buf: bytes) -> str:
+    """
+    Returns the log unchanged if it is at most LOG_WINDOW_BYTES. Otherwise returns
+    the first LOG_HEAD_LINES and last LOG_TAIL_LINES lines, with a marker for
+    how many lines were omitted in between.
+    """
+    lines = buf.decode("utf-8", errors="replace").splitlines()
+    if len(buf) <= LOG_WINDOW_BYTES or len(lines) <= LOG_HEAD_LINES + LOG_TAIL_LINES:
+        return "\n".join(lines)
+    omitted = len(lines) - LOG_HEAD_LINES - LOG_TAIL_LINES
+    return "\n".join(lines[:LOG_HEAD_LINES] + [f"... [{omitted} lines omitted] ..."] + lines[-LOG_TAIL_LINES:])
+
+@ttl_cached
+async def _fetch_logs(pod_name: str, namespace: str, lines: int) -> str:
+    await check_k8s_client()
+    v1 = _CORE_V1
     try:
-        pod = v1.read_namespaced_pod(name=pod_name,namespace=namespace)
-        container_name = pod.spec.containers[0].name
-        logs = v1.read_namespaced_pod_log(name=pod_name,namespace=namespace,container=container_name,tail_lines=lines)
-        
+        try:
+            logs = await v1.read_namespaced_pod_log(name=pod_name,namespace=namespace,tail_lines=lines)
+        except ApiException as e:
+            # The API only demands an explicit container when the pod has several
+            if e.status != 400:
+                raise
+            pod = await v1.read_namespaced_pod(name=pod_name,namespace=namespace)
+            container_name = pod.spec.containers[0].name
+            logs = await v1.read_namespaced_pod_log(name=pod_name,namespace=namespace,container=container_name,tail_lines=lines)
+
         if not logs:
             return f"No logs found for pod {pod_name} in namespace {namespace}"
-        return logs
+
+        # The scans below work on bytes
+        logs = logs.encode("utf-8")
+        summary = summarize_logs(logs)
+        # Only name markers that occur, so the summary never mentions a failure that isn't in the logs
+        found = [f"{k}: {v}" for k, v in summary["counts"].items() if v]
+        counts_text = " | ".join(found) if found else "No failure markers found"
+        last_error = f"Last error: {summary['last_error']}\n" if summary["last_error"] else ""
+        return f"""--- Log Summary ---
+{counts_text}
+{last_error}-------------------
+{log_window(logs)}"""
     except ApiException as e:
         return f"Failed to fetch logs for pod {pod_name} in namespace {namespace}: {e.reason}"
 
-
-@tool
-def k8s_list_pods(namespace:str="default") -> str:
-    """
-    Lists all pods in a namespace with their current status.
-    Use this to identify which pod is failing if you don't know the exact name.
-    """
-
-    check_k8s_client()
-    v1 = client.CoreV1Api()
+@ttl_cached
+async def _list_pods(namespace: str) -> str:
+    await check_k8s_client()
+    v1 = _CORE_V1
     try:
-        pods = v1.list_namespaced_pod(namespace=namespace)
+        pods = await v1.list_namespaced_pod(namespace=namespace)
         summary = []
         for p in pods.items:
             restart_count = sum(c.restart_count for c in p.status.container_statuses) if p.status.container_statuses else 0
@@ -113,4 +222,31 @@ def k8s_list_pods(namespace:str="default") -> str:
         return f"Failed to list pods in namespace {namespace}: {e.reason}"
 
 
+@tool
+async def k8s_get_pod_health(pod_name: str,namespace: str = "default") -> str:
+    """
+    Advanced Health Check.
+    Retrieves the status, restart count, and recent events for a specific Pod.
+    Useful for diagnosing 'Pending', 'CrashLoopBackOff', or 'Error' states.
+    """
+    return await _get_pod_health(pod_name, namespace)
+
+@tool
+async def k8s_fetch_logs(pod_name:str,namespace:str="default", lines:int=50) -> str:
+    """
+    Fetches the last N lines of logs from a Pod, prefixed with a summary of failure markers.
+    Automatically detects if there are multiple containers and fetches logs for the first one.
+    Very large logs (over 16 KB) are shortened to their first 20 and last 100 lines.
+    """
+    return await _fetch_logs(pod_name, namespace, lines)
+
+@tool
+async def k8s_list_pods(namespace:str="default") -> str:
+    """
+    Lists all pods in a namespace with their current status.
+    Use this to identify which pod is failing if you don't know the exact name.
+    """
+    return await _list_pods(namespace)
+
+
 k8s_investigator_tools =[k8s_fetch_logs,k8s_list_pods,k8s_get_pod_health]
\ No newline at end of file